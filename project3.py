@@ -2,6 +2,9 @@ import sys
 import os
 import struct
 import csv
+import mmap
+from array import array
+from bisect import bisect_left
 
 # --- Constants & Configuration ---
 BLOCK_SIZE = 512
@@ -9,6 +12,7 @@ MAGIC_NUMBER = b'4348PRJ3'  # [cite: 300]
 DEGREE = 10                 # Minimal degree t=10 [cite: 316]
 MAX_KEYS = (2 * DEGREE) - 1 # 19 keys [cite: 316]
 MAX_CHILDREN = 2 * DEGREE   # 20 children [cite: 316]
+MAX_VALUE = (1 << 64) - 1   # Keys and values are unsigned 64-bit
 
 # Struct Formats (Big-endian >) [cite: 281]
 # Header: Magic(8s), RootID(Q), NextBlockID(Q), Unused(remaining) [cite: 300, 301, 302]
@@ -20,62 +24,103 @@ NODE_HEADER_SIZE = 24
 NODE_DATA_SIZE = (MAX_KEYS * 8) + (MAX_KEYS * 8) + (MAX_CHILDREN * 8) # 152 + 152 + 160
 PADDING_SIZE = BLOCK_SIZE - (NODE_HEADER_SIZE + NODE_DATA_SIZE)
 
+# Pre-compiled struct so the header format string is parsed once, not per I/O
+_HEADER_STRUCT = struct.Struct(HEADER_FMT)
+
+# In memory a node is one block of native-order 64-bit words laid out exactly
+# like NODE_FMT; only the byte order differs from the on-disk block. The spec
+# fixes the file as big-endian, so little-endian hosts swap the whole block in
+# one C pass rather than switching the format.
+_SWAP = sys.byteorder == 'little'
+_OFF_VALUES = 3 + MAX_KEYS
+_OFF_CHILDREN = _OFF_VALUES + MAX_KEYS
+_ZEROS = memoryview(array('Q', bytes(8 * MAX_CHILDREN)))  # source for clearing slices
+
 class BTreeNode:
+    __slots__ = ('raw', 'data', 'keys', 'values', 'children', 'is_leaf')
+
     def __init__(self):
-        self.block_id = 0
-        self.parent_id = 0
-        self.num_keys = 0
-        self.keys = [0] * MAX_KEYS
-        self.values = [0] * MAX_KEYS
-        self.children = [0] * MAX_CHILDREN
+        self.raw = array('Q', bytes(BLOCK_SIZE))
+        # Views into raw: reading a node fills the buffer, never per-field lists
+        view = memoryview(self.raw)
+        self.keys = view[3:_OFF_VALUES]
+        self.values = view[_OFF_VALUES:_OFF_CHILDREN]
+        self.children = view[_OFF_CHILDREN:_OFF_CHILDREN + MAX_CHILDREN]
+        self.data = view.cast('B')
+        # Cached children[0] == 0; kept in sync wherever a first child is set
+        self.is_leaf = True
 
     @property
-    def is_leaf(self):
-        return self.children[0] == 0
-
-    def serialize(self):
-        return struct.pack(NODE_FMT, self.block_id, self.parent_id, self.num_keys, *self.keys, *self.values, *self.children) + (b'\x00' * PADDING_SIZE)
-
-    @classmethod
-    def deserialize(cls, data):
-        node = cls()
-        unpacked = struct.unpack(NODE_FMT, data[:BLOCK_SIZE - PADDING_SIZE])
-        node.block_id, node.parent_id, node.num_keys = unpacked[0:3]
-        node.keys = list(unpacked[3:3+MAX_KEYS])
-        node.values = list(unpacked[3+MAX_KEYS:3+2*MAX_KEYS])
-        node.children = list(unpacked[3+2*MAX_KEYS:])
-        return node
+    def block_id(self):
+        return self.raw[0]
+
+    @block_id.setter
+    def block_id(self, value):
+        self.raw[0] = value
+
+    @property
+    def parent_id(self):
+        return self.raw[1]
+
+    @parent_id.setter
+    def parent_id(self, value):
+        self.raw[1] = value
+
+    @property
+    def num_keys(self):
+        return self.raw[2]
+
+    @num_keys.setter
+    def num_keys(self, value):
+        self.raw[2] = value
+
+    def swap_order(self):
+        # Converts raw between big-endian (disk) and native order, in place
+        if _SWAP: self.raw.byteswap()
+
+    def deserialize_into(self, data):
+        # Overwrites this node with an on-disk block, reusing its buffer
+        self.data[:] = data
+        self.swap_order()
+        self.is_leaf = self.children[0] == 0
 
 class IndexFile:
     def __init__(self, filename, mode='r+b'):
         self.filename = filename
+        # Header changes are kept in memory and written once, on close()
+        self._header_dirty = False
+        # Children moved by splits -> their new parent; applied once on close()
+        self._moved = {}
         if mode == 'create':
             if os.path.exists(filename):
                 print(f"Error: File {filename} already exists.") # [cite: 242]
                 sys.exit(1)
-            self.file = open(filename, 'wb+')
+            self.file = open(filename, 'wb+', buffering=0)
+            self.file.truncate(BLOCK_SIZE)
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE)
             self.root_id = 0
             self.next_block_id = 1
-            self._write_header()
+            self._header_dirty = True
         else:
             if not os.path.exists(filename):
                 print(f"Error: File {filename} does not exist.") # [cite: 245]
                 sys.exit(1)
-            self.file = open(filename, 'r+b')
+            self.file = open(filename, 'r+b', buffering=0)
+            if os.fstat(self.file.fileno()).st_size < BLOCK_SIZE:
+                 print("Error: Invalid index file.")
+                 sys.exit(1)
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE)
             self._read_header()
+        # Size at open, so close() only trims what _reserve added this session
+        self._opened_size = len(self.mm)
+        self._grown = False
 
     def _write_header(self):
-        self.file.seek(0)
-        self.file.write(struct.pack(HEADER_FMT, MAGIC_NUMBER, self.root_id, self.next_block_id))
+        _HEADER_STRUCT.pack_into(self.mm, 0, MAGIC_NUMBER, self.root_id, self.next_block_id)
 
     def _read_header(self):
-        self.file.seek(0)
-        data = self.file.read(BLOCK_SIZE)
-        if len(data) < BLOCK_SIZE:
-             print("Error: Invalid index file.")
-             sys.exit(1)
         try:
-            magic, root, next_id = struct.unpack(HEADER_FMT, data)
+            magic, root, next_id = _HEADER_STRUCT.unpack_from(self.mm, 0)
         except struct.error:
              print("Error: Invalid header.")
              sys.exit(1)
@@ -85,23 +130,67 @@ class IndexFile:
         self.root_id = root
         self.next_block_id = next_id
 
-    def read_node(self, block_id):
+    def read_node(self, block_id, node=None):
+        # Fills 'node' when given so callers can recycle a node they are done with
         if block_id == 0: return None
-        self.file.seek(block_id * BLOCK_SIZE)
-        return BTreeNode.deserialize(self.file.read(BLOCK_SIZE))
+        if node is None: node = BTreeNode()
+        # The file is memory-mapped, so a block read is a copy out of the mapping
+        offset = block_id * BLOCK_SIZE
+        node.deserialize_into(self.mm[offset:offset + BLOCK_SIZE])
+        return node
 
     def write_node(self, node):
-        self.file.seek(node.block_id * BLOCK_SIZE)
-        self.file.write(node.serialize())
+        offset = node.block_id * BLOCK_SIZE
+        node.swap_order()
+        self.mm[offset:offset + BLOCK_SIZE] = node.raw
+        node.swap_order()
 
     def allocate_node(self):
         node = BTreeNode()
         node.block_id = self.next_block_id
         self.next_block_id += 1
-        self._write_header()
+        self._reserve(self.next_block_id)
+        self._header_dirty = True
         return node
 
+    def _reserve(self, num_blocks):
+        # Grow the file geometrically and map it again; close() trims the unused
+        # tail. mmap.resize() is avoided as it needs mremap(), absent on macOS/BSD.
+        size = num_blocks * BLOCK_SIZE
+        if size > len(self.mm):
+            size = max(size, 2 * len(self.mm))
+            self.mm.close()
+            os.ftruncate(self.file.fileno(), size)
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE)
+            self._grown = True
+
+    def _fix_parents(self):
+        # Single pass over moved children in block order, one node at a time
+        node = None
+        for block_id in sorted(self._moved):
+            node = self.read_node(block_id, node)
+            node.parent_id = self._moved[block_id]
+            self.write_node(node)
+        self._moved.clear()
+
+    # Readahead hints for the mapping; no-ops where madvise is unavailable
+    def hint_sequential(self):
+        # In-order walks of a bulk-loaded index visit blocks nearly front to back
+        if hasattr(mmap, 'MADV_SEQUENTIAL'): self.mm.madvise(mmap.MADV_SEQUENTIAL)
+
+    def hint_random(self):
+        # Point lookups touch one block per level; readahead would be wasted
+        if hasattr(mmap, 'MADV_RANDOM'): self.mm.madvise(mmap.MADV_RANDOM)
+
     def close(self):
+        self._fix_parents()
+        if self._header_dirty:
+            self._write_header()
+        # No flush: unmapping leaves dirty pages to the page cache, like write()
+        self.mm.close()
+        if self._grown:
+            # Trim only the slack _reserve added; never below the size at open
+            self.file.truncate(max(self._opened_size, self.next_block_id * BLOCK_SIZE))
         self.file.close()
 
     # --- Iterative B-Tree Operations (Strict "Max 3 Nodes" Compliance) ---
@@ -110,21 +199,17 @@ class IndexFile:
         if self.root_id == 0: return None
         curr = self.read_node(self.root_id)
         while True:
-            i = 0
-            while i < curr.num_keys and key > curr.keys[i]: i += 1
-            if i < curr.num_keys and key == curr.keys[i]: return (curr.keys[i], curr.values[i])
+            n = curr.num_keys
+            i = bisect_left(curr.keys, key, 0, n)
+            if i < n and key == curr.keys[i]: return (curr.keys[i], curr.values[i])
             if curr.is_leaf: return None
-            curr = self.read_node(curr.children[i]) # [cite: 337, 338]
+            curr = self.read_node(curr.children[i], curr) # [cite: 337, 338]
 
     def insert(self, key, value):
-        if key < 0 or value < 0:
+        if not (0 <= key <= MAX_VALUE and 0 <= value <= MAX_VALUE):
             print("Error: Key and Value must be unsigned.") # [cite: 247]
             return
 
-        if self.search(key):
-            print(f"Error: Key {key} already exists.")
-            return
-
         if self.root_id == 0:
             root = self.allocate_node()
             root.num_keys = 1
@@ -132,21 +217,25 @@ class IndexFile:
             root.values[0] = value
             self.root_id = root.block_id
             self.write_node(root)
-            self._write_header()
+            self._header_dirty = True
             return
 
         root = self.read_node(self.root_id)
         if root.num_keys == MAX_KEYS:
+            if self._subtree_contains(root, key):
+                print(f"Error: Key {key} already exists.")
+                return
             new_root = self.allocate_node()
             new_root.children[0] = self.root_id
+            new_root.is_leaf = False
             root.parent_id = new_root.block_id
             self.write_node(root)
             self.root_id = new_root.block_id
-            self._write_header()
+            self._header_dirty = True
             self.split_child(new_root, 0, root)
-            self.insert_non_full_iterative(new_root, key, value)
-        else:
-            self.insert_non_full_iterative(root, key, value)
+            root = new_root
+        if not self.insert_non_full_iterative(root, key, value):
+            print(f"Error: Key {key} already exists.")
 
     def split_child(self, parent, index, child):
         # Memory Check: Holds 'parent', 'child', and 'z'. (3 nodes) - Compliant
@@ -154,36 +243,32 @@ class IndexFile:
         z.parent_id = parent.block_id
         t = DEGREE
         
-        # Move keys t..2t-2 to Z
+        # Move keys t..2t-2 to Z (whole-row slice copies over the node buffers)
         z.num_keys = t - 1
-        for j in range(t - 1):
-            z.keys[j] = child.keys[j + t]
-            z.values[j] = child.values[j + t]
-            child.keys[j + t] = 0
-            child.values[j + t] = 0
+        z.keys[:t - 1] = child.keys[t:]
+        z.values[:t - 1] = child.values[t:]
+        child.keys[t:] = _ZEROS[:t - 1]
+        child.values[t:] = _ZEROS[:t - 1]
 
-        # Move children t..2t-1 to Z
+        # Move children t..2t-1 to Z. Their parent_id fixups are deferred to
+        # close(), so a child moved several times is rewritten only once.
         if not child.is_leaf:
+            z.children[:t] = child.children[t:]
+            z.is_leaf = False
+            child.children[t:] = _ZEROS[:t]
             for j in range(t):
-                z.children[j] = child.children[j + t]
-                if z.children[j] != 0:
-                    # Transiently load grandchild to update parent pointer
-                    gc = self.read_node(z.children[j])
-                    gc.parent_id = z.block_id
-                    self.write_node(gc)
-                child.children[j + t] = 0
+                self._moved[z.children[j]] = z.block_id
 
         child.num_keys = t - 1
 
-        # Shift parent children
-        for j in range(parent.num_keys, index, -1):
-            parent.children[j + 1] = parent.children[j]
+        # Shift parent children (overlapping slice assignment is a memmove)
+        n = parent.num_keys
+        parent.children[index + 2:n + 2] = parent.children[index + 1:n + 1]
         parent.children[index + 1] = z.block_id
 
         # Shift parent keys
-        for j in range(parent.num_keys - 1, index - 1, -1):
-            parent.keys[j + 1] = parent.keys[j]
-            parent.values[j + 1] = parent.values[j]
+        parent.keys[index + 1:n + 1] = parent.keys[index:n]
+        parent.values[index + 1:n + 1] = parent.values[index:n]
 
         # Move median key to parent
         parent.keys[index] = child.keys[t - 1]
@@ -196,60 +281,148 @@ class IndexFile:
         self.write_node(child)
         self.write_node(z)
         self.write_node(parent)
+        return child, z
+
+    def _subtree_contains(self, node, key):
+        # Searches below 'node' with one scratch node, leaving 'node' intact
+        scratch = None
+        while True:
+            n = node.num_keys
+            i = bisect_left(node.keys, key, 0, n)
+            if i < n and key == node.keys[i]: return True
+            if node.is_leaf: return False
+            node = scratch = self.read_node(node.children[i], scratch)
 
     def insert_non_full_iterative(self, curr, key, value):
-        # Iterative approach avoids stack buildup
+        # Iterative approach avoids stack buildup. Duplicates are detected on
+        # the way down, so no separate search pass is needed; returns False
+        # if the key already exists.
+        spare = None # The node 'curr' replaced, recycled for the next child read
         while True:
-            i = curr.num_keys - 1
+            n = curr.num_keys
+            i = bisect_left(curr.keys, key, 0, n)
+            if i < n and curr.keys[i] == key: return False
             if curr.is_leaf:
-                while i >= 0 and key < curr.keys[i]:
-                    curr.keys[i + 1] = curr.keys[i]
-                    curr.values[i + 1] = curr.values[i]
-                    i -= 1
-                curr.keys[i + 1] = key
-                curr.values[i + 1] = value
+                curr.keys[i + 1:n + 1] = curr.keys[i:n]
+                curr.values[i + 1:n + 1] = curr.values[i:n]
+                curr.keys[i] = key
+                curr.values[i] = value
                 curr.num_keys += 1
                 self.write_node(curr)
-                return
+                return True
             else:
-                while i >= 0 and key < curr.keys[i]:
-                    i -= 1
-                i += 1
-                
                 child_id = curr.children[i]
-                child = self.read_node(child_id)
+                child = self.read_node(child_id, spare)
                 
                 if child.num_keys == MAX_KEYS:
-                    self.split_child(curr, i, child)
+                    # Only split for a key that is really new, so a rejected
+                    # duplicate leaves the file untouched
+                    if self._subtree_contains(child, key): return False
+                    # Both halves are already written and in memory; descend into
+                    # the right one directly instead of reading it back
+                    child, other = self.split_child(curr, i, child)
                     if key > curr.keys[i]:
-                        i += 1
-                    child = self.read_node(curr.children[i])
+                        # Take over the right half in child's buffer so only the
+                        # fresh 'z' is dropped and at most 3 nodes stay live
+                        child.data[:] = other.data
+                        child.is_leaf = other.is_leaf
+                    other = None
                 
                 # Move down to child, releasing 'curr' from memory
-                curr = child 
+                spare, curr = curr, child
+
+    def bulk_load(self, pairs):
+        # Builds an empty tree bottom-up from (key, value) pairs: leaves are
+        # packed left to right, then each internal level above them, so blocks
+        # are allocated and written strictly in order. Holds one node at a time.
+        pairs.sort(key=lambda kv: kv[0]) # Stable: first occurrence of a key wins
+        items = []
+        for key, value in pairs:
+            if not (0 <= key <= MAX_VALUE and 0 <= value <= MAX_VALUE):
+                print("Error: Key and Value must be unsigned.") # [cite: 247]
+            elif items and items[-1][0] == key:
+                print(f"Error: Key {key} already exists.")
+            else:
+                items.append((key, value))
+        if not items: return
+
+        # Plan key counts per node, leaves first. n items over m nodes leave
+        # m-1 separators for the level above; spreading the rest evenly keeps
+        # every non-root node between t-1 and 2t-1 keys.
+        sizes = []
+        n = len(items)
+        while True:
+            m = -(-(n + 1) // MAX_CHILDREN)
+            base, extra = divmod(n - (m - 1), m)
+            sizes.append([base + (g < extra) for g in range(m)])
+            if m == 1: break
+            n = m - 1
+
+        # Block IDs follow allocation order, so parents are known up front
+        starts = [self.next_block_id]
+        for row in sizes[:-1]:
+            starts.append(starts[-1] + len(row))
+        parents = []
+        for level in range(1, len(sizes)):
+            ids = []
+            for g, k in enumerate(sizes[level]):
+                ids.extend([starts[level] + g] * (k + 1))
+            parents.append(ids)
+        parents.append([0])
+        # Size the mapping for every block once, so the writes below never remap
+        self._reserve(starts[-1] + 1)
+
+        for level, row in enumerate(sizes):
+            seps = []
+            pos = 0
+            child_id = starts[level - 1] if level else 0
+            for g, k in enumerate(row):
+                node = self.allocate_node()
+                node.parent_id = parents[level][g]
+                node.num_keys = k
+                for j in range(k):
+                    node.keys[j], node.values[j] = items[pos + j]
+                pos += k
+                if level:
+                    for j in range(k + 1):
+                        node.children[j] = child_id + j
+                    node.is_leaf = False
+                    child_id += k + 1
+                if g < len(row) - 1:
+                    seps.append(items[pos])
+                    pos += 1
+                self.write_node(node)
+            items = seps
+
+        self.root_id = starts[-1]
+        self._header_dirty = True
 
     def traverse(self, node_id, callback):
         # Iterative In-Order Traversal using Stack of IDs
         if node_id == 0: return
-        stack = [] # Stores (block_id, index_of_child_processed)
+        stack = [] # Stores (block_id, index_of_next_key)
         curr_id = node_id
-        
+        node = None # Single node buffer, refilled on every read
+
         while curr_id != 0 or stack:
             if curr_id != 0:
-                stack.append((curr_id, 0)) 
-                # Peek to check leaf status
-                node = self.read_node(curr_id)
-                curr_id = node.children[0] if not node.is_leaf else 0
+                # Each node is read once on the way down; leaves are emitted whole
+                node = self.read_node(curr_id, node)
+                if node.is_leaf:
+                    for i in range(node.num_keys):
+                        callback(node.keys[i], node.values[i])
+                    curr_id = 0
+                else:
+                    stack.append((curr_id, 0))
+                    curr_id = node.children[0]
             else:
                 parent_id, idx = stack.pop()
-                node = self.read_node(parent_id)
-                
-                if idx < node.num_keys:
-                    callback(node.keys[idx], node.values[idx])
-                    # After printing key[idx], we need to visit child[idx+1]
+                node = self.read_node(parent_id, node)
+                callback(node.keys[idx], node.values[idx])
+                # After key[idx], visit child[idx+1]; revisit parent only if keys remain
+                if idx + 1 < node.num_keys:
                     stack.append((parent_id, idx + 1))
-                    if not node.is_leaf:
-                        curr_id = node.children[idx + 1]
+                curr_id = node.children[idx + 1]
 
 # --- CLI Handlers ---
 
@@ -278,6 +451,7 @@ def cmd_search(args):
         print("Usage: project3 search <filename> <key>")
         return
     idx = IndexFile(args[1])
+    idx.hint_random()
     try:
         result = idx.search(int(args[2]))
         if result: print(f"{result[0]} {result[1]}")
@@ -295,14 +469,20 @@ def cmd_load(args):
         print(f"Error: File {args[2]} does not exist.")
         return
     idx = IndexFile(args[1])
+    # An empty index is built bottom-up from the sorted rows instead of per-row inserts
+    pending = [] if idx.root_id == 0 else None
     try:
-        with open(args[2], 'r') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                if len(row) >= 2:
-                    idx.insert(int(row[0]), int(row[1]))
-    except ValueError:
-        print("Error: CSV must contain integers.")
+        try:
+            with open(args[2], 'r') as f:
+                reader = csv.reader(f)
+                for row in reader:
+                    if len(row) >= 2:
+                        key, value = int(row[0]), int(row[1])
+                        if pending is None: idx.insert(key, value)
+                        else: pending.append((key, value))
+        except ValueError:
+            print("Error: CSV must contain integers.")
+        if pending: idx.bulk_load(pending)
     finally:
         idx.close()
 
@@ -311,6 +491,7 @@ def cmd_print(args):
         print("Usage: project3 print <filename>")
         return
     idx = IndexFile(args[1])
+    idx.hint_sequential()
     idx.traverse(idx.root_id, lambda k, v: print(f"{k} {v}"))
     idx.close()
 
@@ -322,6 +503,7 @@ def cmd_extract(args):
         print(f"Error: File {args[2]} already exists.")
         return
     idx = IndexFile(args[1])
+    idx.hint_sequential()
     try:
         with open(args[2], 'w', newline='') as f:
             writer = csv.writer(f)